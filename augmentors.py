@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+
+from mltu import augmentors
+from mltu.annotations.images import Image
+
+""" Faster versions of mltu augmentors, random chance and value sampling are still done by mltu's __call__:
+- RandomBrightness
+- RandomSharpen
+"""
+
+class RandomBrightness(augmentors.RandomBrightness):
+    """ Randomly adjust image brightness, saturation and value are scaled with a uint8 lookup table """
+    def __init__(self, *args, **kwargs) -> None:
+        super(RandomBrightness, self).__init__(*args, **kwargs)
+
+        # Lookup table for HSV channels, hue column stays identity, saturation and value are filled per call
+        self._lut = np.empty((256, 1, 3), dtype=np.uint8)
+        self._lut[:, 0, 0] = np.arange(256)
+
+    def augment(self, image: Image, value: float) -> Image:
+        """ Augment image brightness """
+        # Scale saturation and value channels, hue is left unchanged
+        self._lut[:, 0, 1:] = np.clip(np.arange(256) * value, 0, 255)[:, None]
+
+        # HSV() may return a cached read-only array, so the LUT writes into a new one
+        hsv = cv2.LUT(image.HSV(), self._lut)
+
+        img = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+
+        image.update(img)
+
+        return image
+
+
+class RandomSharpen(augmentors.RandomSharpen):
+    """ Randomly sharpen image, all channels are filtered with a single filter2D call """
+    def __init__(self, *args, **kwargs) -> None:
+        super(RandomSharpen, self).__init__(*args, **kwargs)
+
+        # cv2.addWeighted needs matching dtypes, custom kernels may be passed as integer arrays
+        self._kernel = np.asarray(self._kernel, dtype=np.float32)
+        self._kernel_anchor = np.asarray(self._kernel_anchor, dtype=np.float32)
+
+        # Constant part of the sharpening kernel: kernel_anchor * (lightness_anchor - 1) + kernel
+        self._kernel_base = self._kernel_anchor * (self._lightness_anchor - 1) + self._kernel
+
+        # Reused output for the per call kernel
+        self._kernel_buffer = np.empty_like(self._kernel_base)
+
+    def augment(self, image: Image) -> Image:
+        lightness = np.random.uniform(*self._ligtness_range)
+        alpha = np.random.uniform(*self._alpha_range)
+
+        # Same as (1 - alpha) * anchor + alpha * (anchor * (lightness_anchor + lightness) + kernel - anchor),
+        # computed in a single pass into the preallocated kernel buffer
+        cv2.addWeighted(self._kernel_anchor, 1 - alpha + alpha * lightness, self._kernel_base, alpha, 0, dst=self._kernel_buffer)
+
+        # filter2D applies the kernel to all channels at once
+        image.update(cv2.filter2D(image.numpy(), -1, self._kernel_buffer))
+
+        return image
@@ -0,0 +1,71 @@
+import os
+import cv2
+import tf2onnx
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from keras import layers
+from keras.models import Model, load_model
+from onnxruntime.quantization import quantize_static, CalibrationDataReader, QuantFormat, QuantType
+
+from mltu.configs import BaseModelConfigs
+
+from inference import resize_maintaining_aspect_ratio
+
+class ImageCalibrationDataReader(CalibrationDataReader):
+    """ Feed resized uint8 images to the static quantization calibration """
+    def __init__(self, image_paths: list, input_name: str, width: int, height: int) -> None:
+        self._image_paths = iter(image_paths)
+        self._input_name = input_name
+        self._width = width
+        self._height = height
+
+    def get_next(self) -> dict:
+        image_path = next(self._image_paths, None)
+        if image_path is None:
+            return None
+
+        image = cv2.imread(image_path.replace("\\", "/"))
+        if image is None:
+            raise FileNotFoundError(f"Image {image_path} could not be read.")
+
+        # Same preprocessing as ImageToWordModel, so activation scales are calibrated on the served inputs
+        image = resize_maintaining_aspect_ratio(image, self._width, self._height)
+
+        return {self._input_name: np.expand_dims(image, axis=0)}
+
+# Load configurations of the trained model
+configs = BaseModelConfigs.load("Models/04_sentence_recognition/202501201958/configs.yaml")
+
+onnx_path = os.path.join(configs.model_path, "model.onnx")
+int8_path = os.path.join(configs.model_path, "model.int8.onnx")
+
+model = load_model(os.path.join(configs.model_path, "model.h5"), compile=False)
+height, width = model.input_shape[1:3]
+
+# Take uint8 images as input, the cast and /255 normalization of the model are then part of the graph,
+# so inference never has to expand images to float32
+inputs = layers.Input(shape=model.input_shape[1:], dtype="uint8", name="input")
+uint8_model = Model(inputs=inputs, outputs=model(tf.cast(inputs, tf.float32)))
+
+# Keep batch dimension dynamic, height, width and channels are fixed by the model
+input_signature = [tf.TensorSpec([None, *model.input_shape[1:]], tf.uint8, name="input")]
+
+# Convert Keras model to ONNX
+tf2onnx.convert.from_keras(uint8_model, input_signature=input_signature, opset=17, output_path=onnx_path)
+
+# Calibrate activation ranges on a small subset of the training images
+calibration_paths = pd.read_csv(os.path.join(configs.model_path, "train.csv")).values[:100, 0].tolist()
+calibration_reader = ImageCalibrationDataReader(calibration_paths, "input", width, height)
+
+# Quantize weights and activations to INT8 with statically calibrated scales
+quantize_static(
+    onnx_path, 
+    int8_path, 
+    calibration_reader, 
+    quant_format=QuantFormat.QDQ, 
+    activation_type=QuantType.QUInt8, 
+    weight_type=QuantType.QInt8
+)
+
+print(f"ONNX model saved to {onnx_path}, INT8 model saved to {int8_path}")
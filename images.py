@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+
+from mltu.annotations import images
+
+class CVImage(images.CVImage):
+    """ mltu CVImage that caches its RGB and HSV conversions until the image data changes
+
+    RGB() and HSV() return the cached array marked read-only, copy it before modifying. Caching only pays off
+    when several augmentors convert the same sample, a single HSV() call per sample costs the same as before.
+    """
+    def __init__(self, *args, **kwargs) -> None:
+        # cached color conversions, reset whenever image data changes
+        self._rgb = None
+        self._hsv = None
+
+        super(CVImage, self).__init__(*args, **kwargs)
+
+    @property
+    def image(self) -> np.ndarray:
+        return self._image
+
+    @image.setter
+    def image(self, value: np.ndarray):
+        self._image = value
+        self._rgb, self._hsv = None, None
+
+    def RGB(self) -> np.ndarray:
+        if self.color != "BGR":
+            return super(CVImage, self).RGB()
+
+        if self._rgb is None:
+            self._rgb = cv2.cvtColor(self._image, cv2.COLOR_BGR2RGB)
+            self._rgb.setflags(write=False)
+        return self._rgb
+
+    def HSV(self) -> np.ndarray:
+        if self._hsv is None:
+            self._hsv = super(CVImage, self).HSV()
+            self._hsv.setflags(write=False)
+        return self._hsv
+
+    def update(self, image: np.ndarray):
+        super(CVImage, self).update(image)
+        self._rgb, self._hsv = None, None
+
+        return self
+
+    def flip(self, axis: int = 0):
+        """ Flip image along x or y axis
+
+        Args:
+            axis (int, optional): Axis along which image will be flipped. Defaults to 0.
+
+        Returns:
+            Object with flipped points
+        """
+        # axis must be either 0 or 1
+        if axis not in [0, 1]:
+            raise ValueError(f"axis must be either 0 or 1, not {axis}")
+
+        # cv2.flip writes a contiguous copy, unlike a strided numpy view that gets copied again by later cv2 calls
+        self._image = cv2.flip(self._image, 1 if axis == 0 else 0)
+        self._rgb, self._hsv = None, None
+
+        return self
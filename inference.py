@@ -1,68 +1,319 @@
+import os
+
+# OpenMP / oneDNN threading must be configured before tensorflow is imported,
+# only done when run as a script, so importing ImageToWordModel leaves the environment untouched
+if __name__ == "__main__":
+    os.environ.setdefault("OMP_NUM_THREADS", str(os.cpu_count()))
+    os.environ.setdefault("KMP_BLOCKTIME", "0")
+    os.environ.setdefault("KMP_AFFINITY", "granularity=fine,compact,1,0")
+
 import cv2
 import typing
 import numpy as np
 import tensorflow as tf
 from keras.models import load_model
 
-from mltu.utils.text_utils import ctc_decoder, get_cer, get_wer
-from mltu.transformers import ImageResizer
+from mltu.utils.text_utils import ctc_decoder
+
+def resize_maintaining_aspect_ratio(
+    image: np.ndarray, 
+    width_target: int, 
+    height_target: int, 
+    dst: np.ndarray = None,
+    padding_color: typing.Tuple[int] = (0, 0, 0)
+    ) -> np.ndarray:
+    """ Resize image maintaining aspect ratio and pad with padding_color, same as mltu ImageResizer.resize_maintaining_aspect_ratio
+
+    Args:
+        image (np.ndarray): Image to resize
+        width_target (int): Target width
+        height_target (int): Target height
+        dst (np.ndarray, optional): Preallocated (height_target, width_target, channels) array to write into, 
+            may be of a different dtype than image. Defaults to None.
+        padding_color (typing.Tuple[int]): Color to pad image
+
+    Returns:
+        np.ndarray: Resized image
+    """
+    height, width = image.shape[:2]
+
+    # Image already has the target shape, no resizing or padding needed
+    if height == height_target and width == width_target:
+        if dst is None:
+            return image
+        dst[:] = image
+        return dst
+
+    if dst is None:
+        dst = np.empty((height_target, width_target, *image.shape[2:]), dtype=image.dtype)
+    ratio = min(width_target / width, height_target / height)
+    new_w, new_h = int(width * ratio), int(height * ratio)
+
+    # Same INTER_LINEAR interpolation as mltu ImageResizer, so inference matches training preprocessing
+    resized_image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    delta_w = width_target - new_w
+    delta_h = height_target - new_h
+    top, bottom = delta_h//2, delta_h-(delta_h//2)
+    left, right = delta_w//2, delta_w-(delta_w//2)
+
+    # Fill only the padding borders and copy resized image into the center of dst
+    dst[:top], dst[height_target-bottom:] = padding_color, padding_color
+    dst[:, :left], dst[:, width_target-right:] = padding_color, padding_color
+    dst[top:top+new_h, left:left+new_w] = resized_image
+
+    return dst
 
 class ImageToWordModel:
-    def __init__(self, char_list: typing.Union[str, list], model_path: str):
+    def __init__(
+        self, 
+        char_list: typing.Union[str, list], 
+        model_path: str, 
+        batch_size: int = 32, 
+        jit_compile: bool = True, 
+        intra_op_threads: int = None, 
+        inter_op_threads: int = None
+        ):
         self.char_list = char_list
+        self.batch_size = batch_size
+        self.sess = None
+
+        if model_path.endswith(".onnx"):
+            # ONNX Runtime backend, e.g. for the INT8 model exported by convert_onnx.py
+            import onnxruntime as ort
+
+            sess_options = ort.SessionOptions()
+            sess_options.intra_op_num_threads = intra_op_threads or os.cpu_count()
+            if inter_op_threads:
+                sess_options.inter_op_num_threads = inter_op_threads
+            self.sess = ort.InferenceSession(model_path, sess_options, providers=["CPUExecutionProvider"])
+            self.input_name = self.sess.get_inputs()[0].name
+            self.input_shape = tuple(self.sess.get_inputs()[0].shape[1:3])  # Get height, width from input shape
+            # Quantized models exported by convert_onnx.py take uint8 images, so no float32 expansion is needed
+            input_dtype = np.uint8 if self.sess.get_inputs()[0].type == "tensor(uint8)" else np.float32
+            self._input_buffer = np.empty((self.batch_size, *self.input_shape, 3), dtype=input_dtype)
+            return
+
+        # Must be set before the model is loaded and the TensorFlow runtime is initialized
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
         self.model = load_model(model_path, compile=False)
         self.input_shape = self.model.input_shape[1:3]  # Get height, width from input shape
+        self._input_buffer = np.empty((self.batch_size, *self.input_shape, 3), dtype=np.float32)
+
+        if jit_compile:
+            tf.config.optimizer.set_jit(True)
+
+        # Trace the forward pass once per batch size, so calls skip the Keras Python-level dispatch.
+        # Batch dimension is pinned to 1 (single image) or batch_size, so XLA compiles each graph only once
+        forward = tf.function(self.model, jit_compile=jit_compile)
+        self._infer = {
+            traced_batch: forward.get_concrete_function(tf.TensorSpec([traced_batch, *self.input_shape, 3], tf.float32))
+            for traced_batch in sorted({1, self.batch_size})
+        }
 
     def predict(self, image: np.ndarray):
 
-        image = ImageResizer.resize_maintaining_aspect_ratio(image, *self.input_shape[::-1])
+        return self.predict_batch([image])[0]
+
+    def predict_batch(self, images: typing.List[np.ndarray]) -> typing.List[str]:
+        texts = []
+        for start in range(0, len(images), self.batch_size):
+            texts += self._predict_chunk(images[start:start + self.batch_size])
+
+        return texts
+
+    def _predict_chunk(self, images: typing.List[np.ndarray]) -> typing.List[str]:
+        height, width = self.input_shape
+
+        # Resize all images straight into the (B, H, W, C) input buffer so the model is called only once
+        for i, image in enumerate(images):
+            resize_maintaining_aspect_ratio(image, width, height, dst=self._input_buffer[i])
+
+        return self.decode(self._infer_chunk(self._input_buffer[:len(images)], in_buffer=True))
+
+    def infer(self, image_pred: np.ndarray) -> np.ndarray:
+        """ Run the model on a batch of images already resized to the model input shape, without decoding """
+        if len(image_pred) <= self.batch_size:
+            return self._infer_chunk(image_pred)
 
-        image_pred = np.expand_dims(image, axis=0).astype(np.float32)
+        # Larger batches are run in chunks that fit the input buffer
+        return np.concatenate([
+            self._infer_chunk(image_pred[start:start + self.batch_size]) for start in range(0, len(image_pred), self.batch_size)
+        ])
 
-        preds = self.model.predict(image_pred, verbose=0)
+    def _infer_chunk(self, image_pred: np.ndarray, in_buffer: bool = False) -> np.ndarray:
+        """ Run the model on at most batch_size images, in_buffer means image_pred already fills the first rows of the input buffer """
+        batch_len = len(image_pred)
 
-        text = ctc_decoder(preds, self.char_list)[0]
+        # ONNX model has a dynamic batch dimension, traced functions exist only for batch 1 and batch_size
+        if self.sess is not None:
+            traced_batch = batch_len
+        else:
+            traced_batch = 1 if batch_len == 1 else self.batch_size
 
-        return text
+        # Incomplete batch is zero padded to the traced shape, input is cast to the model input type
+        if batch_len < traced_batch or image_pred.dtype != self._input_buffer.dtype:
+            if not in_buffer:
+                self._input_buffer[:batch_len] = image_pred
+            self._input_buffer[batch_len:traced_batch] = 0
+            image_pred = self._input_buffer[:traced_batch]
+
+        return self._run(image_pred)[:batch_len]
+
+    def decode(self, preds: np.ndarray) -> typing.List[str]:
+        """ Decode model predictions into texts """
+        texts = ctc_decoder(preds, self.char_list)
+
+        return texts
+
+    def _run(self, image_pred: np.ndarray) -> np.ndarray:
+        if self.sess is not None:
+            return self.sess.run(None, {self.input_name: image_pred})[0]
+
+        return self._infer[len(image_pred)](tf.convert_to_tensor(image_pred)).numpy()
 
 if __name__ == "__main__":
+    import hashlib
+    import argparse
     import pandas as pd
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
     from tqdm import tqdm
     from mltu.configs import BaseModelConfigs
 
+    from text_utils import get_cer, get_wer
+
+    parser = argparse.ArgumentParser(description="Validate the OCR model on the validation dataset")
+    parser.add_argument("--interactive", action="store_true", help="Print and show every image with its prediction, press 'q' to stop")
+    parser.add_argument("--intra_op_threads", type=int, default=os.cpu_count(), help="Threads used inside a single TensorFlow / ONNX Runtime op")
+    parser.add_argument("--inter_op_threads", type=int, default=2, help="Threads used to run independent TensorFlow / ONNX Runtime ops in parallel")
+    parser.add_argument("--model_path", type=str, default=None, help="Model to validate, .h5 or .onnx (e.g. model.int8.onnx from convert_onnx.py). Defaults to model.h5 of the configs")
+    parser.add_argument("--mmap", action="store_true", help="Read resized validation images from a memory-mapped .npy cache, created on first use")
+    args = parser.parse_args()
+
     # Load configurations
     configs = BaseModelConfigs.load("Models/04_sentence_recognition/202501201958/configs.yaml")
 
-    # Initialize model with .h5 path
+    # Trained Keras model unless another one (e.g. the quantized ONNX model) is requested explicitly
+    model_path = args.model_path or os.path.join(configs.model_path, "model.h5")
+    print(f"Validating model: {model_path}")
+
     model = ImageToWordModel(
-        model_path="Models/04_sentence_recognition/202501201958/model.h5",
-        char_list=configs.vocab
+        model_path=model_path,
+        char_list=configs.vocab,
+        intra_op_threads=args.intra_op_threads,
+        inter_op_threads=args.inter_op_threads
     )
 
     # Load validation dataset
     df = pd.read_csv("Models/04_sentence_recognition/202501201958/val.csv").values.tolist()
+    image_paths = [image_path.replace("\\", "/") for image_path, _ in df]
+    labels = [str(label) for _, label in df]
+
+    height, width = model.input_shape
+
+    # Resize the whole validation set once into a .npy file, so later runs skip reading, decoding and resizing
+    # Cache name is keyed on the validation image paths, so a changed val.csv gets a new cache
+    paths_hash = hashlib.sha1("\n".join(image_paths).encode()).hexdigest()[:10]
+    cache_path = os.path.join(configs.model_path, f"val_{height}x{width}_{paths_hash}.npy")
+    if args.mmap and not os.path.exists(cache_path):
+        # Written to a temporary file first, so an interrupted run never leaves a partial cache behind
+        tmp_path = cache_path + ".tmp"
+        cache = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=(len(image_paths), height, width, 3))
+        for i, image_path in enumerate(tqdm(image_paths, desc="Caching validation images")):
+            image = cv2.imread(image_path)
+            if image is None:
+                raise FileNotFoundError(f"Image {image_path} could not be read.")
+            resize_maintaining_aspect_ratio(image, width, height, dst=cache[i])
+        cache.flush()
+        del cache
+        os.replace(tmp_path, cache_path)
+
+    def decode_and_resize(image_bytes: tf.Tensor) -> np.ndarray:
+        image = cv2.imdecode(np.frombuffer(image_bytes.numpy(), np.uint8), cv2.IMREAD_COLOR)
+        return resize_maintaining_aspect_ratio(image, width, height)
 
-    accum_cer, accum_wer = [], []
-    for image_path, label in tqdm(df):
-        image = cv2.imread(image_path.replace("\\", "/"))
+    # Read files with native tf ops (no GIL), then decode and resize in parallel, while the model works on the previous batch
+    dataset = tf.data.Dataset.from_tensor_slices((image_paths, labels))
+    dataset = dataset.map(
+        lambda image_path, label: (tf.io.read_file(image_path), image_path, label),
+        num_parallel_calls=tf.data.AUTOTUNE
+    )
+    dataset = dataset.map(
+        lambda image_bytes, image_path, label: (tf.py_function(decode_and_resize, [image_bytes], tf.uint8), image_path, label),
+        num_parallel_calls=tf.data.AUTOTUNE
+    )
+    dataset = dataset.batch(model.batch_size).prefetch(tf.data.AUTOTUNE)
+
+    def load_batches() -> typing.Iterator[typing.Tuple[np.ndarray, typing.List[str], typing.List[str]]]:
+        """ Yield (images, image paths, labels) batches from the memory-mapped cache or the tf.data pipeline """
+        if args.mmap:
+            # Already resized images, pages are loaded lazily and stay in the OS page cache between runs
+            images = np.load(cache_path, mmap_mode="r")
+            if len(images) != len(image_paths):
+                raise ValueError(f"Cache {cache_path} has {len(images)} images, but the validation dataset has {len(image_paths)}, delete it to rebuild.")
+            for start in range(0, len(images), model.batch_size):
+                end = start + model.batch_size
+                yield np.asarray(images[start:end]), image_paths[start:end], labels[start:end]
+            return
+
+        for batch_images, batch_paths, batch_labels in dataset:
+            yield batch_images.numpy(), [path.decode() for path in batch_paths.numpy()], [label.decode() for label in batch_labels.numpy()]
+
+    def post_process(preds: np.ndarray, labels: typing.List[str]) -> typing.List[typing.Tuple[str, float, float]]:
+        prediction_texts = model.decode(preds)
+        return [(text, get_cer(text, label), get_wer(text, label)) for text, label in zip(prediction_texts, labels)]
+
+    sum_cer, sum_wer, count = 0.0, 0.0, 0
+    stop = False
+    futures = deque()
+    executor = ThreadPoolExecutor(max_workers=2)
+    pbar = tqdm(total=len(df))
+    for batch_images, batch_paths, batch_labels in load_batches():
+        # Decoding and CER/WER run in background, while the next batch goes through the model
+        future = executor.submit(post_process, model.infer(batch_images), batch_labels)
+        futures.append(future)
+        pbar.update(len(batch_images))
 
-        prediction_text = model.predict(image)
+        # Add already finished batches to the running sums
+        while futures and futures[0].done():
+            for _, cer, wer in futures.popleft().result():
+                sum_cer, sum_wer, count = sum_cer + cer, sum_wer + wer, count + 1
 
-        cer = get_cer(prediction_text, label)
-        wer = get_wer(prediction_text, label)
-        print("Image: ", image_path)
-        print("Label:", label)
-        print("Prediction: ", prediction_text)
-        print(f"CER: {cer}; WER: {wer}")
+        if count:
+            pbar.set_postfix(CER=sum_cer / count, WER=sum_wer / count)
 
-        accum_cer.append(cer)
-        accum_wer.append(wer)
+        # Printing and showing images blocks the loop, so it is only done on request
+        if not args.interactive:
+            continue
 
-        cv2.imshow(prediction_text, image)
-        key = cv2.waitKey(0)
-        cv2.destroyAllWindows()
+        for image, image_path, label, (prediction_text, cer, wer) in zip(batch_images, batch_paths, batch_labels, future.result()):
+            print("Image: ", image_path)
+            print("Label:", label)
+            print("Prediction: ", prediction_text)
+            print(f"CER: {cer}; WER: {wer}")
 
-        if key == ord('q'):
+            cv2.imshow(prediction_text, image)
+            key = cv2.waitKey(0)
+            cv2.destroyAllWindows()
+
+            if key == ord('q'):
+                stop = True
                 break
 
-    print(f"Average CER: {np.average(accum_cer)}, Average WER: {np.average(accum_wer)}")
\ No newline at end of file
+        if stop:
+            break
+
+    pbar.close()
+
+    # Wait for the batches still being post-processed
+    for future in futures:
+        for _, cer, wer in future.result():
+            sum_cer, sum_wer, count = sum_cer + cer, sum_wer + wer, count + 1
+
+    executor.shutdown()
+
+    print(f"Average CER: {sum_cer / max(count, 1)}, Average WER: {sum_wer / max(count, 1)}")
\ No newline at end of file
@@ -0,0 +1,66 @@
+import numpy as np
+from numba import njit
+
+""" Numba compiled replacements for mltu.utils.text_utils.get_cer and get_wer """
+
+@njit(cache=True)
+def edit_distance(a: np.ndarray, b: np.ndarray) -> int:
+    """ Levenshtein distance between two int32 encoded sequences, keeping only two rows of the DP table """
+    if len(a) < len(b):
+        a, b = b, a
+
+    previous = np.arange(len(b) + 1).astype(np.int32)
+    current = np.empty(len(b) + 1, dtype=np.int32)
+    for i in range(1, len(a) + 1):
+        current[0] = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+        previous, current = current, previous
+
+    return previous[len(b)]
+
+def encode_chars(text: str) -> np.ndarray:
+    return np.array([ord(c) for c in text], dtype=np.int32)
+
+def get_cer(prediction: str, label: str) -> float:
+    """ Character error rate: edit distance between prediction and label characters divided by label length """
+    # Same as mltu get_cer, empty label gives 0.0
+    if not label:
+        return 0.0
+
+    return edit_distance(encode_chars(prediction), encode_chars(label)) / len(label)
+
+def get_wer(prediction: str, label: str) -> float:
+    """ Word error rate: edit distance between prediction and label words divided by number of label words """
+    prediction_words, label_words = prediction.split(), label.split()
+
+    # Encode words as integer ids shared between prediction and label
+    vocab = {}
+    prediction_ids = np.array([vocab.setdefault(w, len(vocab)) for w in prediction_words], dtype=np.int32)
+    label_ids = np.array([vocab.setdefault(w, len(vocab)) for w in label_words], dtype=np.int32)
+
+    # mltu get_wer divides by zero for a label without words, 0.0 is returned instead, same as get_cer
+    if not label_words:
+        return 0.0
+
+    return edit_distance(prediction_ids, label_ids) / len(label_words)
+
+# Compile once at import, so the JIT cost is not paid inside the validation loop
+get_cer("warm up", "warm-up")
+
+if __name__ == "__main__":
+    # Check that results match the mltu implementations on random strings
+    import random
+    from mltu.utils import text_utils
+
+    alphabet = "ab c"
+    for _ in range(1000):
+        prediction = "".join(random.choices(alphabet, k=random.randint(0, 20)))
+        label = "".join(random.choices(alphabet, k=random.randint(0, 20)))
+
+        assert np.isclose(get_cer(prediction, label), text_utils.get_cer(prediction, label)), (prediction, label)
+        if label.split():
+            assert np.isclose(get_wer(prediction, label), text_utils.get_wer(prediction, label)), (prediction, label)
+
+    print("get_cer and get_wer match mltu.utils.text_utils")
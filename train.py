@@ -6,9 +6,8 @@ import os
 from tqdm import tqdm
 
 from mltu.transformers import ImageResizer, LabelIndexer, LabelPadding, ImageShowCV2
-from mltu.augmentors import RandomBrightness, RandomErodeDilate, RandomSharpen
+from mltu.augmentors import RandomErodeDilate
 from mltu.preprocessors import ImageReader
-from mltu.annotations.images import CVImage
 
 from mltu.tensorflow.dataProvider import DataProvider
 from mltu.tensorflow.metrics import CERMetric, WERMetric
@@ -18,6 +17,8 @@ from mltu.tensorflow.callbacks import TrainLogger
 from keras.callbacks import EarlyStopping, ModelCheckpoint, ReduceLROnPlateau, TensorBoard
 
 from configs import ModelConfigs
+from augmentors import RandomBrightness, RandomSharpen
+from images import CVImage
 from model import train_model
 
 sentences_txt_path = os.path.join("Datasets", "ascii", "sentences.txt")